@@ -1,24 +1,85 @@
 from __future__ import division
 from __future__ import print_function
 
-from math import sqrt
+try:
+    from time import perf_counter as clock
+except ImportError:
+    # Python 2
+    from time import clock
 from copy import deepcopy
-import time
 from itertools import product
+from multiprocessing import Pool, cpu_count
 
 import numpy as np
-import numpy.matlib as ml
 
 import scipy
 import scipy.optimize
 from scipy import stats
 
-from . import functions
 from . import helpers 
 
 import logging
 logger = logging.getLogger('supramolecular')
 
+
+
+# Fitter used by fit_many worker processes, sent once per process by 
+# _init_worker rather than with every job
+_worker_fitter = None
+
+def _init_worker(fitter):
+    global _worker_fitter
+    _worker_fitter = fitter
+
+def _fit_single(args, fitter=None):
+    """
+    Run a single unsaved fit, returning raw optimised params. Module level 
+    for pickling to fit_many's worker processes.
+    """
+    params_init, xdata, ydata, method = args
+    fitter = fitter or _worker_fitter
+
+    # run_scipy writes results into params_init, which may share dicts with
+    # fitter.params: copy it so fits here leave them alone as in workers
+    results = fitter.run_scipy(params_init=deepcopy(params_init),
+                               save       =False, 
+                               xdata      =xdata, 
+                               ydata      =ydata,
+                               method     =method)
+    return results["_params_raw"]
+
+def fit_many(fitter, jobs, method=None, processes=None):
+    """
+    Run independent fits in parallel across CPU cores
+
+    Arguments:
+        fitter:    Fitter  Fitter to run
+        jobs:      list    List of (params_init, xdata, ydata) tuples, one 
+                           per fit
+        method:    string  Optimisation method passed to Fitter.run_scipy
+        processes: int     Number of worker processes, defaults to CPU count,
+                           at most one per job. Fits run in this process if 1
+
+    Returns:
+        ndarray:  n x p array of raw optimised params, one row per job
+    """
+
+    args = [ (params_init, xdata, ydata, method) 
+             for params_init, xdata, ydata in jobs ]
+
+    processes = min(len(args), processes or cpu_count())
+    if processes <= 1:
+        return np.array([ _fit_single(a, fitter) for a in args ])
+
+    pool = Pool(processes, initializer=_init_worker, initargs=(fitter,))
+    try:
+        params = pool.map(_fit_single, args)
+    finally:
+        pool.close()
+        pool.join()
+
+    return np.array(params)
+
 class Fitter():
     def __init__(self, xdata, ydata, function, normalise=True, params=None):
         self.xdata = xdata # Original input data, no processing applied
@@ -73,7 +134,8 @@ class Fitter():
         logger.debug(params_init)
 
         # Set input data
-        x = self.xdata if xdata is None else xdata
+        # Calculate x invariants once for all objective function calls
+        x = self.function.prepare(self.xdata if xdata is None else xdata)
         y = self._preprocess(self.ydata if ydata is None else ydata)
         
         # Sort parameter dict into ordered array of parameters and bounds
@@ -89,15 +151,34 @@ class Fitter():
         logger.debug(b)
 
         # Run optimizer 
-        tic = time.clock()
-        result = scipy.optimize.minimize(self.function.objective,
-                                         p,
-                                         bounds=b,
-                                         args=(x, y, True),
-                                         method=method if method else "Nelder-Mead",
-                                         tol=1e-18,
-                                        )
-        toc = time.clock()
+        tic = clock()
+        if method == "trf":
+            # Bounded nonlinear least squares on the residuals vector, with
+            # analytic Jacobian where the function provides derivatives
+            jac = self.function.jacobian if self.function.df is not None \
+                  else "2-point"
+            lb = [ -np.inf if lo is None else lo for lo, hi in b ]
+            ub = [  np.inf if hi is None else hi for lo, hi in b ]
+            result = scipy.optimize.least_squares(self.function.residuals,
+                                                  p,
+                                                  jac=jac,
+                                                  bounds=(lb, ub),
+                                                  args=(x, y),
+                                                  method="trf",
+                                                  x_scale="jac",
+                                                  ftol=1e-15,
+                                                  xtol=1e-15,
+                                                  gtol=1e-15,
+                                                 )
+        else:
+            result = scipy.optimize.minimize(self.function.objective,
+                                             p,
+                                             bounds=b,
+                                             args=(x, y, True),
+                                             method=method if method else "Nelder-Mead",
+                                             tol=1e-18,
+                                            )
+        toc = clock()
 
         logger.debug("Fitter.run: FIT FINISHED")
         logger.debug("Fitter.run: Fitter.function")
@@ -174,6 +255,10 @@ class Fitter():
         # Calculate deLevie uncertainty
         d = np.float64(1e-6) # delta
          
+        x   = self.function.prepare(self.xdata)
+        y   = self._preprocess(self.ydata)
+        ydata_init = self.ydata[:,0]
+
         # 0. Calculate partial differentials for each parameter
         diffs = []
         for i, pi in enumerate(params):
@@ -183,9 +268,6 @@ class Fitter():
             params_shift[i] = pi_shift
 
             # Calculate fit with modified parameter set
-            x   = self.xdata
-            y   = self._preprocess(self.ydata)
-            ydata_init = self.ydata[:,0]
             fit_shift_norm, _, _, _, _, _ = self.function.objective(
                     params_shift, 
                     x, 
@@ -263,12 +345,13 @@ class Fitter():
             params_init[key] = param
             params_init[key]["init"] = param["value"]
 
-        params_arr = np.zeros((n_iter, len(params_init)))
-
+        # Generate all shifted datasets here so random draws don't depend
+        # on worker processes
+        jobs = []
         for n in range(n_iter):
             # Calculate error multiplier arrays matching ydata, xdata shapes
             xdata_error_arr = np.random.standard_normal(xdata.shape)\
-                              *ml.repmat(xdata_error, xdata.shape[1], 1).T\
+                              *np.asarray(xdata_error)[:,np.newaxis]\
                               + 1
             ydata_error_arr = np.random.standard_normal(ydata.shape)\
                               *ydata_error\
@@ -278,20 +361,13 @@ class Fitter():
             xdata_shift = xdata*xdata_error_arr
             ydata_shift = ydata*ydata_error_arr
 
-            logger.debug("Fitter.monte_carlo: params_init")
-            logger.debug(params_init)
+            jobs.append((params_init, xdata_shift, ydata_shift))
 
-            results = self.run_scipy(params_init=params_init,
-                                     save       =False, 
-                                     xdata      =xdata_shift, 
-                                     ydata      =ydata_shift,
-                                     method     =method)
-
-            logger.debug("Fitter.monte_carlo: results")
-            logger.debug(results)
+        logger.debug("Fitter.monte_carlo: params_init")
+        logger.debug(params_init)
 
-            # Log resulting params
-            params_arr[n] = results["_params_raw"]
+        # Fit each shifted dataset in parallel
+        params_arr = fit_many(self, jobs, method=method)
 
         percentile_params = np.percentile(params_arr, [2.5, 97.5], axis=0).T
 
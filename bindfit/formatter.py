@@ -416,6 +416,7 @@ def options(fitter, data_id=None, params=None, dilute=False):
     # Default options for each fitter type
     method_nm     = {"name": "Nelder-Mead"}
     method_lbfgsb = {"name": "L-BFGS-B"}
+    method_trf    = {"name": "trf"} # Least squares on residuals
 
     flavour_none    = {"name":           "None (Full)",
                        "key":            "none"}
@@ -466,7 +467,7 @@ def options(fitter, data_id=None, params=None, dilute=False):
                 "options": {
                     "dilute":  False,
                     "normalise": True,
-                    "method": [method_nm, method_lbfgsb],
+                    "method": [method_nm, method_lbfgsb, method_trf],
                     "flavour": [],
                     },
                 },
@@ -493,7 +494,7 @@ def options(fitter, data_id=None, params=None, dilute=False):
                 "options": {
                     "dilute":  False,
                     "normalise": True,
-                    "method": [method_nm, method_lbfgsb],
+                    "method": [method_nm, method_lbfgsb, method_trf],
                     "flavour": [flavour_none, 
                                 flavour_noncoop, 
                                 flavour_add, 
@@ -523,7 +524,7 @@ def options(fitter, data_id=None, params=None, dilute=False):
                 "options": {
                     "dilute":  False,
                     "normalise": True,
-                    "method": [method_nm, method_lbfgsb],
+                    "method": [method_nm, method_lbfgsb, method_trf],
                     "flavour": [flavour_none, 
                                 flavour_noncoop, 
                                 flavour_add, 
@@ -546,7 +547,7 @@ def options(fitter, data_id=None, params=None, dilute=False):
                 "options": {
                     "dilute":  True,
                     "normalise": True,
-                    "method": [method_nm, method_lbfgsb],
+                    "method": [method_nm, method_lbfgsb, method_trf],
                     "flavour": [],
                     },
                 },
@@ -573,7 +574,7 @@ def options(fitter, data_id=None, params=None, dilute=False):
                 "options": {
                     "dilute":  True,
                     "normalise": True,
-                    "method": [method_nm, method_lbfgsb],
+                    "method": [method_nm, method_lbfgsb, method_trf],
                     "flavour": [flavour_none, 
                                 flavour_noncoop, 
                                 flavour_add, 
@@ -603,7 +604,7 @@ def options(fitter, data_id=None, params=None, dilute=False):
                 "options": {
                     "dilute":  True,
                     "normalise": True,
-                    "method": [method_nm, method_lbfgsb],
+                    "method": [method_nm, method_lbfgsb, method_trf],
                     "flavour": [flavour_none, 
                                 flavour_noncoop, 
                                 flavour_add, 
@@ -626,7 +627,7 @@ def options(fitter, data_id=None, params=None, dilute=False):
                 "options": {
                     "dilute":  False,
                     "normalise": True,
-                    "method": [method_nm, method_lbfgsb],
+                    "method": [method_nm, method_lbfgsb, method_trf],
                     "flavour": [],
                     },
                 },
@@ -646,7 +647,7 @@ def options(fitter, data_id=None, params=None, dilute=False):
                 "options": {
                     "dilute":    False,
                     "normalise": False,
-                    "method": [method_nm, method_lbfgsb],
+                    "method": [method_nm, method_lbfgsb, method_trf],
                     "flavour":   [],
                     },
                 },
@@ -673,7 +674,7 @@ def options(fitter, data_id=None, params=None, dilute=False):
                 "options": {
                     "dilute":  False,
                     "normalise": True,
-                    "method": [method_nm, method_lbfgsb],
+                    "method": [method_nm, method_lbfgsb, method_trf],
                     "flavour": [],
                     },
                 },
@@ -700,7 +701,7 @@ def options(fitter, data_id=None, params=None, dilute=False):
                 "options": {
                     "dilute":    False,
                     "normalise": False,
-                    "method": [method_nm, method_lbfgsb],
+                    "method": [method_nm, method_lbfgsb, method_trf],
                     "flavour":   [],
                     },
                 },
@@ -7,16 +7,36 @@
 from __future__ import division
 from __future__ import print_function
 
+from collections import namedtuple
+
 import numpy as np
-import numpy.matlib as ml
 
-from . import helpers
+try:
+    # Optional: compiled cubic solver
+    import numba
+except ImportError:
+    numba = None
+
+try:
+    # Optional: GPU arrays for batched objective evaluation
+    import cupy
+except ImportError:
+    cupy = None
 
 import logging
 logger = logging.getLogger('supramolecular')
 
 
 
+# Per-dataset invariants of xdata used by the function definitions, 
+# calculated once per fit by BaseFunction.prepare rather than on every 
+# objective call
+# Indexes like xdata: [0] is h0, [1] is g0
+Prepared = namedtuple("Prepared", 
+                      "h0 g0 h0g0 sumhg diffhg neg_h0 neg_g0 h0_inv")
+
+
+
 #
 # Base Function class template
 #
@@ -30,12 +50,59 @@ class BaseFunction(object):
     # for the mixin functions to override BaseFunction template functions.
     # See here: https://www.ianlewis.org/en/mixins-and-python
 
-    def __init__(self, fitter, f=None, normalise=True, flavour="none"):
+    def __init__(self, fitter, f=None, normalise=True, flavour="none", 
+                 df=None):
         self.f         = f
+        self.df        = df # Optional derivatives of f w.r.t. params
         self.fitter    = fitter
         self.normalise = normalise 
         self.flavour   = flavour
 
+        # Results carried between objective calls (e.g. previous cubic roots
+        # as a starting guess for the next)
+        self._cache    = {}
+
+        # Work arrays reused between objective calls, keyed by number of 
+        # observations
+        self._scratch  = {}
+
+    def _get_scratch(self, n):
+        """
+        Return dict of work arrays for n observations, allocated once
+        """
+
+        if n not in self._scratch:
+            self._scratch[n] = {"poly": np.empty((4, n)),
+                                "out":  {}} # Function output buffers
+        return self._scratch[n]
+
+    def prepare(self, xdata):
+        """
+        Calculate Prepared invariants of an x x m input xdata array
+        """
+
+        if isinstance(xdata, Prepared):
+            return xdata
+
+        xdata = np.ascontiguousarray(xdata, dtype=np.float64)
+
+        h0     = xdata[0]
+        h0_inv = 1/h0
+
+        if xdata.shape[0] < 2:
+            # Aggregation fitters: h0 only
+            return Prepared(h0, None, None, None, None, -h0, None, h0_inv)
+
+        g0 = xdata[1]
+        return Prepared(h0     = h0,
+                        g0     = g0,
+                        h0g0   = h0*g0,
+                        sumhg  = h0 + g0,
+                        diffhg = h0 - g0,
+                        neg_h0 = -h0,
+                        neg_g0 = -g0,
+                        h0_inv = h0_inv)
+
     def objective(self, params, xdata, ydata, scalar=False, *args, **kwargs):
         pass
 
@@ -69,7 +136,7 @@ class BindingMixin():
         Arguments:
             params:         dict     Parameter guess
             datax:          ndarray  x x m array of x independent variables, 
-                                     m obs
+                                     m obs, or Prepared from this array
             datay:          ndarray  y x m array of y dependent variables, m obs
             scalar:         bool     Calc and return only ssr 
             ydata_init:     ndarray  Array of initial y data values, length y,
@@ -81,16 +148,25 @@ class BindingMixin():
             float:  Sum of least squares
         """
 
+        xdata = self.prepare(xdata)
+
         logger.debug("Function.objective: params, xdata shape, ydata shape")
         logger.debug(params)
-        logger.debug(xdata.shape)
+        logger.debug(xdata.h0.shape)
         logger.debug(ydata.shape)
 
         # Calculate predicted HG complex concentrations for this set of 
         # parameters and concentrations
+        # Results are only written into reused output buffers when not 
+        # returned to the caller
+        scratch = self._get_scratch(xdata.h0.shape[0])
         molefrac_raw, molefrac = self.f(params, 
                                         xdata, 
-                                        flavour=self.flavour)
+                                        flavour=self.flavour,
+                                        cache=self._cache,
+                                        scratch=scratch,
+                                        out=scratch["out"] if scalar else None,
+                                        display=not scalar)
 
         if self.normalise:
             # Don't fit first H column if initial values subtracted
@@ -101,7 +177,7 @@ class BindingMixin():
         else:
             # Solve by matrix division - linear regression by least squares
             # Equivalent to << coeffs = molefrac\ydata (EA = HG\DA) >> in Matlab
-            coeffs_raw, _, _, _ = np.linalg.lstsq(molefrac_raw.T, ydata.T)
+            coeffs_raw = _normal_eq_solve(molefrac_raw.T, ydata.T)
 
         # Restrict UV coefficients to +ve values when normalised
         if not self.normalise and "uv" in self.fitter:
@@ -118,21 +194,178 @@ class BindingMixin():
         # data array
         fit = molefrac_raw.T.dot(coeffs_raw).T
 
+        if scalar:
+            # Only sum of squares needed: calculate residuals in place and 
+            # reduce in a single pass without a squared residuals array
+            fit -= ydata
+            return np.einsum("ij,ij", fit, fit)
+
         logger.debug("Function.objective: fit shape")
         logger.debug(fit.shape)
 
         # Calculate residuals (fitted data - input data)
         residuals = fit - ydata
 
-        # Transpose any column-matrices to rows
-        if scalar:
-            return np.square(residuals).sum()
-        else:
-            # Return full fit with formatted molefrac and coeffs
-            coeffs = self.format_coeffs(coeffs_raw, 
-                                        ydata_init=ydata_init, 
-                                        h0_init=xdata[0][0])
-            return fit, residuals, coeffs_raw, molefrac_raw, coeffs, molefrac
+        # Return full fit with formatted molefrac and coeffs
+        coeffs = self.format_coeffs(coeffs_raw, 
+                                    ydata_init=ydata_init, 
+                                    h0_init=xdata[0][0])
+        return fit, residuals, coeffs_raw, molefrac_raw, coeffs, molefrac
+
+    def objective_batch(self, params, xdata, ydata, xp=np, *args, **kwargs):
+        """
+        Objective function for a batch of parameter guesses at once, e.g. for
+        a grid search over K. Supported by single parameter (1:1) fitters.
+
+        Arguments:
+            params:         ndarray  1 x B array of B parameter guesses
+            datax:          ndarray  x x m array of x independent variables, 
+                                     m obs, or Prepared from this array
+            datay:          ndarray  y x m array of y dependent variables, m obs
+            xp:             module   Array module of the inputs, numpy or cupy
+
+        Returns:
+            ndarray:  B array of sums of least squares
+        """
+
+        if self.f not in (nmr_1to1, uv_1to1):
+            raise ValueError(
+                    "objective_batch supports 1:1 fitters only, not {}"
+                    .format(self.fitter))
+
+        xdata = self.prepare(xdata)
+
+        # Rows: molefractions, B x m for each
+        molefrac_raw, _ = self.f(params, xdata, flavour=self.flavour, 
+                                 display=False)
+
+        if self.normalise:
+            # Don't fit first H column if initial values subtracted
+            molefrac_raw = molefrac_raw[1:]
+
+        # Solve all B linear regressions together
+        # B x m obs x n molefractions
+        A = xp.moveaxis(molefrac_raw, 0, -1)
+        coeffs_raw = _normal_eq_solve(A, ydata.T, xp=xp)
+
+        # Restrict UV coefficients to +ve values when normalised
+        if not self.normalise and "uv" in self.fitter:
+            coeffs_raw[coeffs_raw < 0] = 0
+
+        residuals = xp.matmul(A, coeffs_raw)
+        residuals -= ydata.T
+        return xp.einsum("bij,bij->b", residuals, residuals)
+
+    def objective_batched_gpu(self, params, xdata, ydata, *args, **kwargs):
+        """
+        As objective_batch, evaluated on the GPU with cupy. Worthwhile for 
+        large (10^4+) batches of parameter guesses.
+
+        Returns:
+            ndarray:  B array of sums of least squares, on the host
+        """
+
+        if cupy is None:
+            raise ImportError("objective_batched_gpu requires cupy")
+
+        xdata = self.prepare(xdata)
+        xdata = Prepared(*[ cupy.asarray(v) if v is not None else None 
+                            for v in xdata ])
+
+        params = [ cupy.asarray(p) for p in params ]
+        ydata  = cupy.asarray(ydata, dtype=np.float64)
+
+        ssr = self.objective_batch(params, xdata, ydata, xp=cupy)
+        return cupy.asnumpy(ssr)
+
+    def residuals(self, params, xdata, ydata, *args, **kwargs):
+        """
+        Residuals function for least squares optimisers (Fitter.run_scipy 
+        method "trf")
+
+        Returns:
+            ndarray:  m*y array of flattened residuals
+        """
+
+        xdata = self.prepare(xdata)
+
+        molefrac_raw, _ = self.f(params, 
+                                 xdata, 
+                                 flavour=self.flavour,
+                                 cache=self._cache,
+                                 scratch=self._get_scratch(xdata.h0.shape[0]),
+                                 display=False)
+
+        if self.normalise:
+            # Don't fit first H column if initial values subtracted
+            molefrac_raw = molefrac_raw[1:]
+
+        A = molefrac_raw.T
+        coeffs_raw = _normal_eq_solve(A, ydata.T)
+
+        # Restrict UV coefficients to +ve values when normalised
+        if not self.normalise and "uv" in self.fitter:
+            coeffs_raw[coeffs_raw < 0] = 0
+
+        residuals = A.dot(coeffs_raw)
+        residuals -= ydata.T
+        return residuals.ravel()
+
+    def jacobian(self, params, xdata, ydata, *args, **kwargs):
+        """
+        Analytic Jacobian of Function.residuals, for functions with 
+        derivatives df.
+
+        Coefficients are eliminated by linear least squares (variable 
+        projection), so with A the fit molefractions, c = (A'A)^-1 A'y and 
+        r = Ac - y:
+            dc = -(A'A)^-1 (dA'r + A'dA c)
+            dr = dA c + A dc
+
+        Returns:
+            ndarray:  m*y x p array of derivatives of residuals
+        """
+
+        xdata = self.prepare(xdata)
+
+        molefrac_raw, _ = self.f(params, 
+                                 xdata, 
+                                 flavour=self.flavour,
+                                 cache=self._cache,
+                                 scratch=self._get_scratch(xdata.h0.shape[0]),
+                                 display=False)
+        dmolefrac       = self.df(params, 
+                                  xdata, 
+                                  flavour=self.flavour, 
+                                  cache=self._cache)
+
+        if self.normalise:
+            # Don't fit first H column if initial values subtracted
+            molefrac_raw = molefrac_raw[1:]
+            dmolefrac    = dmolefrac[:, 1:]
+
+        A = molefrac_raw.T
+        coeffs_ls = _normal_eq_solve(A, ydata.T)
+        residuals = A.dot(coeffs_ls) - ydata.T
+        AtA_inv   = np.linalg.pinv(A.T.dot(A))
+
+        # Restrict UV coefficients to +ve values when normalised
+        # Clipped coefficients are constant
+        coeffs_raw = np.copy(coeffs_ls)
+        free       = np.ones(coeffs_raw.shape)
+        if not self.normalise and "uv" in self.fitter:
+            clip = coeffs_raw < 0
+            coeffs_raw[clip] = 0
+            free[clip]       = 0
+
+        jac = []
+        for dA in dmolefrac:
+            dA = dA.T
+            dc = -AtA_inv.dot(dA.T.dot(residuals) + A.T.dot(dA.dot(coeffs_ls)))
+            dr = dA.dot(coeffs_raw) + A.dot(dc*free)
+            jac.append(dr.ravel())
+
+        return np.array(jac).T
 
     def format_x(self, xdata):
         h0 = xdata[0]
@@ -210,16 +443,22 @@ class AggMixin():
         """
         """
 
+        xdata = self.prepare(xdata)
+
         logger.debug("Function.objective: params, xdata shape, ydata shape")
         logger.debug(params)
-        logger.debug(xdata.shape)
+        logger.debug(xdata.h0.shape)
         logger.debug(ydata.shape)
 
         # Calculate predicted complex concentrations for this set of 
         # parameters and concentrations
         molefrac_raw, molefrac = self.f(params,
                                         xdata, 
-                                        flavour=self.flavour)
+                                        flavour=self.flavour,
+                                        cache=self._cache,
+                                        scratch=self._get_scratch(
+                                            xdata.h0.shape[0]),
+                                        display=not scalar)
         h  = molefrac_raw[0]
         hs = molefrac_raw[1]
         he = molefrac_raw[2]
@@ -230,7 +469,7 @@ class AggMixin():
         if fit_coeffs is not None:
             coeffs_raw = fit_coeffs
         else:
-            coeffs_raw, _, _, _ = np.linalg.lstsq(hmat.T, ydata.T)
+            coeffs_raw = _normal_eq_solve(hmat.T, ydata.T)
 
         # Calculate data from fitted parameters 
         # (will be normalised since input data was norm'd)
@@ -238,21 +477,51 @@ class AggMixin():
         # data array
         fit = hmat.T.dot(coeffs_raw).T
 
+        if scalar:
+            # Only sum of squares needed: calculate residuals in place and 
+            # reduce in a single pass without a squared residuals array
+            fit -= ydata
+            return np.einsum("ij,ij", fit, fit)
+
         logger.debug("Function.objective: fit")
         logger.debug(fit)
 
         # Calculate residuals (fitted data - input data)
         residuals = fit - ydata
 
-        # Transpose any column-matrices to rows
-        if scalar:
-            return np.square(residuals).sum()
-        else:
-            # Return full fit with formatted molefrac and coeffs
-            coeffs = self.format_coeffs(coeffs_raw, 
-                                        ydata_init=ydata_init, 
-                                        h0_init=xdata[0][0])
-            return fit, residuals, coeffs_raw, hmat, coeffs, molefrac
+        # Return full fit with formatted molefrac and coeffs
+        coeffs = self.format_coeffs(coeffs_raw, 
+                                    ydata_init=ydata_init, 
+                                    h0_init=xdata[0][0])
+        return fit, residuals, coeffs_raw, hmat, coeffs, molefrac
+
+    def residuals(self, params, xdata, ydata, *args, **kwargs):
+        """
+        Residuals function for least squares optimisers (Fitter.run_scipy 
+        method "trf")
+
+        Returns:
+            ndarray:  m*y array of flattened residuals
+        """
+
+        xdata = self.prepare(xdata)
+
+        molefrac_raw, _ = self.f(params,
+                                 xdata, 
+                                 flavour=self.flavour,
+                                 cache=self._cache,
+                                 scratch=self._get_scratch(xdata.h0.shape[0]),
+                                 display=False)
+        h  = molefrac_raw[0]
+        hs = molefrac_raw[1]
+        he = molefrac_raw[2]
+        hmat = np.array([h + he/2, hs + he/2])
+
+        coeffs_raw = _normal_eq_solve(hmat.T, ydata.T)
+
+        residuals = hmat.T.dot(coeffs_raw)
+        residuals -= ydata.T
+        return residuals.ravel()
 
     def format_x(self, xdata):
         return xdata[0]
@@ -358,72 +627,525 @@ def inhibitor_response(params, xdata, *args, **kwargs):
 #
 
 
+#
+# Linear least squares
+#
+
+def _normal_eq_solve(A, B, xp=np):
+    """
+    Least squares solution X of A.X = B via the normal equations 
+    A^T.A.X = A^T.B, much cheaper than np.linalg.lstsq (SVD) for tall narrow 
+    A such as the 1-3 column molefraction matrices.
+
+    A may also be a stack of matrices (... x n x m), solved together for a 
+    single B. xp is the array module of A and B, numpy or cupy.
+
+    Falls back to np.linalg.lstsq where columns of A are (nearly) linearly
+    dependent.
+    """
+
+    At  = xp.swapaxes(A, -1, -2)
+    AtA = xp.matmul(At, A)
+    AtB = xp.matmul(At, B)
+    m   = AtA.shape[-1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if m == 1:
+            X  = AtB/AtA
+            ok = AtA[..., 0, 0] > 0
+        else:
+            # Scale to unit diagonal so the conditioning check is 
+            # independent of concentration units
+            scale = xp.sqrt(xp.diagonal(AtA, axis1=-2, axis2=-1))
+            scale = scale[..., np.newaxis]
+            AtA_s = AtA/scale/xp.swapaxes(scale, -1, -2)
+            ok    = xp.linalg.det(AtA_s) > 1e-8
+
+            # Solve well-conditioned systems only
+            AtA_s = xp.where(ok[..., np.newaxis, np.newaxis], AtA_s, xp.eye(m))
+            X = xp.linalg.solve(AtA_s, AtB/scale)/scale
+
+    # No reordering of A or B is needed for lstsq: it copies both into 
+    # work arrays for LAPACK (gelsd overwrites them) regardless of order
+    if A.ndim == 2:
+        if not ok:
+            X, _, _, _ = xp.linalg.lstsq(A, B)
+    else:
+        for i in zip(*xp.nonzero(~ok)):
+            X[i], _, _, _ = xp.linalg.lstsq(A[i], B)
+
+    return X
+
+
+
+#
+# Polynomial solvers
+#
+
+def _cubic_smallest_positive_real(a, b, c, d, cache=None):
+    """
+    Calculates the smallest real non-negative root of a*x^3 + b*x^2 + c*x + d
+    for each observation, given 1D arrays of cubic coefficients.
+
+    Solved in closed form for all observations at once: one root from the
+    trigonometric (Viete) solution where there are three real roots, or
+    Cardano's solution where there is one, and the remaining two from the
+    quadratic left over. Observations with a == 0 are solved as quadratics.
+    Observations with no real non-negative root are set to 0.
+
+    If a cache dict is given, roots are stored in it and used as the 
+    starting point for Newton iterations on the next call, where successive
+    optimiser parameter guesses give nearby roots (without numba only). 
+    Observations where Newton does not converge to the smallest non-negative
+    root are solved in closed form.
+    """
+
+    a, b, c, d = np.broadcast_arrays(*[ np.asarray(co, dtype=np.float64)
+                                        for co in (a, b, c, d) ])
+
+    # Warm start is only faster than the NumPy closed form, not the 
+    # compiled kernel
+    guess = cache.get("root") if cache is not None and numba is None \
+            else None
+
+    if guess is not None and guess.shape == a.shape:
+        soln, inds = _cubic_newton(a, b, c, d, guess)
+        if inds.any():
+            soln[inds] = _cubic_closed_form(a[inds], b[inds], 
+                                            c[inds], d[inds])
+    else:
+        soln = _cubic_closed_form(a, b, c, d)
+
+    if cache is not None:
+        cache["root"] = soln
+
+    return soln
+
+def _cubic_newton(a, b, c, d, x, max_iter=6):
+    """
+    Refines guesses x of the smallest real non-negative roots of
+    a*x^3 + b*x^2 + c*x + d by Newton iteration.
+
+    Returns:
+        (ndarray, ndarray)  Refined roots, and bool array of observations
+                            where this is not a converged smallest 
+                            non-negative root
+    """
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for i in range(max_iter):
+            step = (((a*x + b)*x + c)*x + d)/((3*a*x + 2*b)*x + c)
+            x = x - step
+            converged = np.abs(step) <= 1e-14*np.abs(x)
+            if converged.all():
+                break
+
+        # Check remaining roots, of a*y^2 + bq*y + cq, for a smaller 
+        # non-negative root
+        bq = b + a*x
+        cq = c + bq*x
+        sq = np.sqrt(bq*bq - 4*a*cq)
+        r2 = -0.5*(bq + np.copysign(sq, bq))
+        r3 = cq/r2
+        r2 = r2/a
+        smaller = ((r2 >= 0) & (r2 < x)) | ((r3 >= 0) & (r3 < x))
+
+    return x, ~converged | ~(x >= 0) | smaller | (a == 0)
+
+def _cubic_closed_form(a, b, c, d):
+    """
+    Closed form solution for _cubic_smallest_positive_real, using the 
+    compiled _cubic_kernel if numba is installed.
+    """
+
+    if numba is None:
+        return _cubic_smallest_positive_real_np(a, b, c, d)
+
+    soln = np.empty(a.shape[0])
+    _cubic_kernel(np.ascontiguousarray(a), np.ascontiguousarray(b),
+                  np.ascontiguousarray(c), np.ascontiguousarray(d), soln)
+
+    # Kernel returns NaN where the closed form overflows
+    inds = np.isnan(soln)
+    if inds.any():
+        soln[inds] = _cubic_smallest_positive_real_np(a[inds], b[inds], 
+                                                      c[inds], d[inds])
+    return soln
+
+def _cubic_smallest_positive_real_np(a, b, c, d):
+    """
+    NumPy implementation of _cubic_smallest_positive_real.
+    """
+
+    n = a.shape[0]
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        # Monic cubic x^3 + B*x^2 + C*x + D
+        B = b/a
+        C = c/a
+        D = d/a
+
+        # Depressed cubic t^3 + p*t + q, x = t - B/3
+        p = C - B*B/3
+        q = 2*B*B*B/27 - B*C/3 + D
+        three = (-(4*p*p*p + 27*q*q) >= 0) & (p < 0)
+
+        # Three real roots: trigonometric solution
+        # Take the root furthest from the other two, which is the only one
+        # not sensitive to rounding in arccos
+        m     = 2*np.sqrt(-p/3)
+        theta = np.arccos(np.clip(3*q/(2*p)*np.sqrt(-3/p), -1, 1))/3
+        k     = np.arange(3)[:, np.newaxis]
+        t_trig = m*np.cos(theta - 2*np.pi*k/3)
+        t_trig = t_trig[np.abs(t_trig).argmax(axis=0), np.arange(n)]
+
+        # One real root: Cardano's solution, with the sign of the first cube
+        # root term chosen to avoid cancellation
+        u = -np.sign(q)*np.cbrt(np.abs(q)/2 + np.sqrt(q*q/4 + p*p*p/27))
+        t_cardano = u + np.where(u != 0, -p/(3*u), 0)
+
+        r1 = np.where(three, t_trig, t_cardano) - B/3
+
+        # Polish with a Newton step, kept only where it improves the root
+        f    = ((r1 + B)*r1 + C)*r1 + D
+        r1_n = r1 - f/((3*r1 + 2*B)*r1 + C)
+        f_n  = ((r1_n + B)*r1_n + C)*r1_n + D
+        r1   = np.where(np.abs(f_n) < np.abs(f), r1_n, r1)
+
+        # Remaining roots from x^2 - (r2 + r3)*x + r2*r3, taking the sum and
+        # product of roots from Vieta's formulas (rather than deflating) to
+        # preserve small roots next to a large r1
+        # Complex roots are left as NaN
+        cq = np.where(r1 != 0, -D/r1, C)
+        bq = np.where(np.maximum(np.abs(B), np.abs(r1)) <=
+                      np.maximum(np.abs(C), np.abs(cq))/np.abs(r1),
+                      B + r1,
+                      (cq - C)/r1)
+        sq = np.sqrt(bq*bq - 4*cq)
+        r2 = -0.5*(bq + np.copysign(sq, bq))
+        r3 = np.where(r2 != 0, cq/r2, 0)
+
+        # Rows: roots, cols: data points
+        roots = np.vstack((r1, r2, r3))
+
+        # Degenerate cubic: solve b*x^2 + c*x + d (or c*x + d)
+        quad = a == 0
+        if quad.any():
+            bq, cq, dq = b[quad], c[quad], d[quad]
+            sq = np.sqrt(cq*cq - 4*bq*dq)
+            nan = np.full(bq.shape, np.nan)
+            roots[:, quad] = np.where(bq != 0,
+                                      [(-cq + sq)/(2*bq), (-cq - sq)/(2*bq), nan],
+                                      [-dq/cq, nan, nan])
+
+        # Closed form overflows for extreme coefficient ratios: fall back to
+        # companion matrix eigenvalues for these observations
+        inds = ~quad & ~np.isfinite(r1) \
+               & np.isfinite(B) & np.isfinite(C) & np.isfinite(D)
+        if inds.any():
+            roots_eig = _cubic_roots_eig(a[inds], b[inds], c[inds], d[inds])
+            roots[:, inds] = np.where(np.imag(roots_eig) == 0,
+                                      np.real(roots_eig),
+                                      np.nan)
+
+        # Smallest real +ve root, 0 if no positive real roots
+        soln = np.where(roots >= 0, roots, np.inf).min(axis=0)
+
+    soln[np.isinf(soln)] = 0.0
+    return soln
+
+if numba is not None:
+    @numba.njit(cache=True, error_model="numpy")
+    def _cubic_kernel_row(a, b, c, d):
+        """
+        Scalar version of _cubic_smallest_positive_real_np for compilation. 
+        Returns NaN where the closed form overflows.
+        """
+
+        if a == 0:
+            # Degenerate cubic: solve b*x^2 + c*x + d (or c*x + d)
+            if b == 0:
+                r1, r2, r3 = -d/c, np.nan, np.nan
+            else:
+                sq = np.sqrt(c*c - 4*b*d)
+                r1, r2, r3 = (-c + sq)/(2*b), (-c - sq)/(2*b), np.nan
+        else:
+            # Monic cubic x^3 + B*x^2 + C*x + D
+            B = b/a
+            C = c/a
+            D = d/a
+
+            # Depressed cubic t^3 + p*t + q, x = t - B/3
+            p = C - B*B/3
+            q = 2*B*B*B/27 - B*C/3 + D
+
+            if -(4*p*p*p + 27*q*q) >= 0 and p < 0:
+                # Three real roots: trigonometric solution
+                # Take the root furthest from the other two
+                m     = 2*np.sqrt(-p/3)
+                arg   = min(max(3*q/(2*p)*np.sqrt(-3/p), -1.), 1.)
+                theta = np.arccos(arg)/3
+                t = 0.
+                for k in range(3):
+                    tk = m*np.cos(theta - 2*np.pi*k/3)
+                    if abs(tk) > abs(t):
+                        t = tk
+            else:
+                # One real root: Cardano's solution
+                u = np.cbrt(abs(q)/2 + np.sqrt(q*q/4 + p*p*p/27))
+                if q > 0:
+                    u = -u
+                elif q == 0:
+                    u = 0.
+                t = u - p/(3*u) if u != 0 else 0.
+
+            r1 = t - B/3
+            if not np.isfinite(r1):
+                return np.nan
+
+            # Polish with a Newton step, kept only where it improves the root
+            f    = ((r1 + B)*r1 + C)*r1 + D
+            r1_n = r1 - f/((3*r1 + 2*B)*r1 + C)
+            f_n  = ((r1_n + B)*r1_n + C)*r1_n + D
+            if abs(f_n) < abs(f):
+                r1 = r1_n
+
+            # Remaining roots from x^2 - (r2 + r3)*x + r2*r3
+            cq = -D/r1 if r1 != 0 else C
+            if max(abs(B), abs(r1)) <= max(abs(C), abs(cq))/abs(r1):
+                bq = B + r1
+            else:
+                bq = (cq - C)/r1
+            sq = np.sqrt(bq*bq - 4*cq)
+            r2 = -0.5*(bq + (sq if bq >= 0 else -sq))
+            r3 = cq/r2 if r2 != 0 else 0.
+
+        # Smallest real +ve root, 0 if no positive real roots
+        soln = np.inf
+        for r in (r1, r2, r3):
+            if r >= 0 and r < soln:
+                soln = r
+        return soln if soln != np.inf else 0.
+
+    # Serial: a few hundred rows per call are too few to split over threads,
+    # and parallel kernels are not safe to call from several server threads
+    @numba.njit(cache=True, error_model="numpy")
+    def _cubic_kernel(a, b, c, d, soln):
+        """
+        Compiled _cubic_smallest_positive_real, writes roots to soln.
+        """
+
+        for i in range(a.shape[0]):
+            soln[i] = _cubic_kernel_row(a[i], b[i], c[i], d[i])
+
+def _cubic_roots_eig(a, b, c, d):
+    """
+    Calculates all roots of a*x^3 + b*x^2 + c*x + d for each observation as
+    eigenvalues of a stack of companion matrices, in a single LAPACK call.
+
+    Returns:
+        ndarray  3 x n array of complex roots
+    """
+
+    n = a.shape[0]
+
+    # Companion matrix of monic cubic for each observation
+    M = np.zeros((n, 3, 3))
+    M[:, 0, 0] = -b/a
+    M[:, 0, 1] = -c/a
+    M[:, 0, 2] = -d/a
+    M[:, 1, 0] = 1
+    M[:, 2, 1] = 1
+
+    return np.linalg.eigvals(M).T
+
+
 #
 # Function definitions
 #
+# Each returns molefractions for fitting and for display. Display 
+# molefractions are not calculated (None) with display=False, for objective
+# calls during optimisation
+#
+
+def _array_module(a):
+    """
+    Return the array module of a, cupy for GPU arrays, otherwise numpy.
+    """
+
+    return np if cupy is None else cupy.get_array_module(a)
 
-def nmr_1to1(params, xdata, *args, **kwargs):
+def _out_buffer(out, key, shape, xp=np):
+    """
+    Return work array key of an out dict, allocated if missing or of a 
+    different shape.
+    """
+
+    buf = out.get(key)
+    if buf is None or buf.shape != shape:
+        buf = out[key] = xp.empty(shape)
+    return buf
+
+def nmr_1to1(params, xdata, out=None, display=True, *args, **kwargs):
     """
     Calculates predicted [HG] given data object parameters as input.
+
+    k (params[0]) may be a 1D array of B guesses, giving B x m results.
+    xdata and k may be cupy arrays, giving cupy results.
+    If an out dict is given, results and temporaries are written into work
+    arrays kept in it.
     """
 
+    h0 = xdata.h0
+    xp = _array_module(h0)
+
     k = params[0]
- 
-    h0 = xdata[0]
-    g0 = xdata[1]
+    if np.ndim(k):
+        k = xp.asarray(k)[:, np.newaxis]
+        out = None
+        shape = k.shape[:1] + h0.shape
+    else:
+        shape = h0.shape
+
+    if out is None:
+        out = {}
+
+    # Rows: [H], [HG]
+    hg_mat_fit = _out_buffer(out, "mf_fit", (2,) + shape, xp=xp)
+    h, hg      = hg_mat_fit
 
     # Calculate predicted [HG] concentration given input [H]0, [G]0 matrices 
     # and Ka guess
-    hg = 0.5*(\
-             (g0 + h0 + (1/k)) - \
-             np.lib.scimath.sqrt(((g0+h0+(1/k))**2)-(4*((g0*h0))))\
-             )
-    h  = h0 - hg
+    s    = xp.add(xdata.sumhg, 1/k, out=_out_buffer(out, "s", shape, xp=xp))
+    disc = xp.multiply(s, s, out=_out_buffer(out, "disc", shape, xp=xp))
+    disc -= 4*xdata.h0g0
 
-    # Replace any non-real solutions with sqrt(h0*g0) 
-    inds = np.imag(hg) > 0
-    hg[inds] = np.sqrt(h0[inds] * g0[inds])
+    inds    = disc < 0
+    nonreal = inds.any()
+    if nonreal:
+        xp.maximum(disc, 0, out=disc)
+    xp.sqrt(disc, out=hg)
+    xp.subtract(s, hg, out=hg)
+    hg *= 0.5
+
+    if nonreal:
+        # Replace any non-real solutions with sqrt(h0*g0) 
+        hg[inds] = xp.sqrt(xp.broadcast_to(xdata.h0g0, shape)[inds])
+
+    xp.subtract(h0, hg, out=h)
 
     # Convert [HG] concentration to molefraction for NMR
-    hg /= h0
-    h  /= h0
+    hg_mat_fit *= xdata.h0_inv
+
+    if not display:
+        # Only fit molefractions needed
+        return hg_mat_fit, None
 
     # Make column vector
     #hg_mat = hg[np.newaxis]
-    hg_mat_fit = np.vstack((h, hg))
-    hg_mat     = np.vstack((h, hg))
+    hg_mat     = xp.copy(hg_mat_fit)
 
     return hg_mat_fit, hg_mat
 
-def uv_1to1(params, xdata, *args, **kwargs):
+def uv_1to1(params, xdata, out=None, display=True, *args, **kwargs):
     """
     Calculates predicted [HG] given data object parameters as input.
+
+    k (params[0]) may be a 1D array of B guesses, giving B x m results.
+    xdata and k may be cupy arrays, giving cupy results.
+    If an out dict is given, results and temporaries are written into work
+    arrays kept in it.
     """
 
+    h0 = xdata.h0
+    xp = _array_module(h0)
+
     k = params[0]
- 
-    h0 = xdata[0]
-    g0 = xdata[1]
+    if np.ndim(k):
+        k = xp.asarray(k)[:, np.newaxis]
+        out = None
+        shape = k.shape[:1] + h0.shape
+    else:
+        shape = h0.shape
+
+    if out is None:
+        out = {}
+
+    # Rows: [H], [HG]
+    hg_mat_fit = _out_buffer(out, "mf_fit", (2,) + shape, xp=xp)
+    h, hg      = hg_mat_fit
 
     # Calculate predicted [HG] concentration given input [H]0, [G]0 matrices 
     # and Ka guess
-    hg = 0.5*(\
-             (g0 + h0 + (1/k)) - \
-             np.lib.scimath.sqrt(((g0+h0+(1/k))**2)-(4*((g0*h0))))\
-             )
-    h  = h0 - hg
+    s    = xp.add(xdata.sumhg, 1/k, out=_out_buffer(out, "s", shape, xp=xp))
+    disc = xp.multiply(s, s, out=_out_buffer(out, "disc", shape, xp=xp))
+    disc -= 4*xdata.h0g0
 
-    # Replace any non-real solutions with sqrt(h0*g0) 
-    inds = np.imag(hg) > 0
-    hg[inds] = np.sqrt(h0[inds] * g0[inds])
+    inds    = disc < 0
+    nonreal = inds.any()
+    if nonreal:
+        xp.maximum(disc, 0, out=disc)
+    xp.sqrt(disc, out=hg)
+    xp.subtract(s, hg, out=hg)
+    hg *= 0.5
 
-    # Make column vector
-    hg_mat_fit = np.vstack((h,    hg))    # Free concentration for correct fitting
-    hg_mat     = np.vstack((h/h0, hg/h0)) # Molefrac for display
+    if nonreal:
+        # Replace any non-real solutions with sqrt(h0*g0) 
+        hg[inds] = xp.sqrt(xp.broadcast_to(xdata.h0g0, shape)[inds])
+
+    xp.subtract(h0, hg, out=h)
+
+    if not display:
+        # Only fit molefractions needed
+        return hg_mat_fit, None
+
+    # Free concentration for correct fitting, molefrac for display
+    hg_mat     = hg_mat_fit*xdata.h0_inv
 
     return hg_mat_fit, hg_mat
 
-def uv_1to2(params, xdata, flavour="none", *args, **kwargs):
+def _dhg_dk_1to1(k, xdata):
+    """
+    Calculates derivative of predicted 1:1 [HG] with respect to K.
+    """
+
+    s    = xdata.sumhg + 1/k
+    disc = s*s - 4*xdata.h0g0
+
+    # [HG] = 0.5*(s - sqrt(disc)), ds/dk = -1/k^2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dhg = 0.5*(-1/(k*k))*(1 - s/np.sqrt(disc))
+
+    # Non-real solutions are replaced with constant sqrt(h0*g0)
+    dhg[~(disc > 0)] = 0
+    return dhg
+
+def nmr_1to1_deriv(params, xdata, *args, **kwargs):
+    """
+    Calculates derivatives of nmr_1to1 fit molefractions with respect to each
+    parameter.
+
+    Returns:
+        ndarray  p x 2 x m array
+    """
+
+    dhg = _dhg_dk_1to1(params[0], xdata)*xdata.h0_inv
+    return np.stack((-dhg, dhg))[np.newaxis]
+
+def uv_1to1_deriv(params, xdata, *args, **kwargs):
+    """
+    Calculates derivatives of uv_1to1 fit concentrations with respect to each
+    parameter.
+
+    Returns:
+        ndarray  p x 2 x m array
+    """
+
+    dhg = _dhg_dk_1to1(params[0], xdata)
+    return np.stack((-dhg, dhg))[np.newaxis]
+
+def uv_1to2(params, xdata, flavour="none", cache=None, scratch=None, 
+            display=True, *args, **kwargs):
     """
     Calculates predicted [HG] and [HG2] given data object and binding constants
     as input.
@@ -435,37 +1157,36 @@ def uv_1to2(params, xdata, flavour="none", *args, **kwargs):
     else:
         k12 = params[1]
  
-    h0 = xdata[0]
-    g0 = xdata[1]
+    h0 = xdata.h0
+    g0 = xdata.g0
 
     # Calculate free guest concentration [G]: solve cubic
-    a = np.ones(h0.shape[0])*k11*k12
-    b = 2*k11*k12*h0 + k11 - g0*k11*k12
-    c = 1 + k11*h0 - k11*g0
-    d = -1. * g0
-
-    # Rows: data points, cols: poly coefficients
-    poly = np.column_stack((a, b, c, d))
+    # b and c written into reused work array where available
+    if scratch is None:
+        scratch = {"poly": np.empty((4, h0.shape[0]))}
+    _, b, c, _ = scratch["poly"]
+
+    a = k11*k12
+    np.multiply(a, g0, out=c)
+    np.multiply(2*a, h0, out=b)
+    b += k11
+    b -= c
+    np.multiply(k11, xdata.diffhg, out=c)
+    c += 1
+    d = xdata.neg_g0
 
     # Solve cubic in [G] for each observation
-    g = np.zeros(h0.shape[0])
-    for i, p in enumerate(poly):
-        roots = np.roots(p)
-
-        # Smallest real +ve root is [G]
-        select = np.all([np.imag(roots) == 0, np.real(roots) >= 0], axis=0)
-        if select.any():
-            soln = roots[select].min()
-            soln = float(np.real(soln))
-        else:
-            # No positive real roots, set solution to 0
-            soln = 0.0
-        
-        g[i] = soln
+    # Smallest real +ve root is [G]
+    g = _cubic_smallest_positive_real(a, b, c, d, cache=cache)
 
     # Calculate [HG] and [HG2] complex concentrations 
-    hg  = h0*((g*k11)/(1+(g*k11)+(g*g*k11*k12)))
-    hg2 = h0*(((g*g*k11*k12))/(1+(g*k11)+(g*g*k11*k12)))
+    # Shared terms of the binding polynomial 1 + K11[G] + K11K12[G]^2
+    gk11    = g*k11
+    gk11k12 = g*g*a
+    denom   = h0/(1 + gk11 + gk11k12)
+
+    hg  = gk11*denom
+    hg2 = gk11k12*denom
     h   = h0 - hg - hg2
 
     if flavour == "add" or flavour == "stat":
@@ -474,10 +1195,15 @@ def uv_1to2(params, xdata, flavour="none", *args, **kwargs):
     else:
         hg_mat_fit = np.vstack((h, hg, hg2))
         
-    hg_mat = np.vstack((h/h0, hg/h0, hg2/h0)) # Display-only molefracs
+    if not display:
+        # Only fit molefractions needed
+        return hg_mat_fit, None
+
+    hg_mat = np.vstack((h, hg, hg2))*xdata.h0_inv # Display-only molefracs
     return hg_mat_fit, hg_mat
 
-def nmr_1to2(params, xdata, flavour="none", *args, **kwargs):
+def nmr_1to2(params, xdata, flavour="none", cache=None, scratch=None, 
+             display=True, *args, **kwargs):
     """
     Calculates predicted [HG] and [HG2] given data object and binding constants
     as input.
@@ -500,38 +1226,36 @@ def nmr_1to2(params, xdata, flavour="none", *args, **kwargs):
         logger.debug(k11)
         logger.debug(k12)
 
-    h0  = xdata[0]
-    g0  = xdata[1]
+    g0  = xdata.g0
 
     # Calculate free guest concentration [G]: solve cubic
-    a = np.ones(h0.shape[0])*k11*k12
-    b = 2*k11*k12*h0 + k11 - g0*k11*k12
-    c = 1 + k11*h0 - k11*g0
-    d = -1. * g0
-
-    # Rows: data points, cols: poly coefficients
-    poly = np.column_stack((a, b, c, d))
+    # b and c written into reused work array where available
+    if scratch is None:
+        scratch = {"poly": np.empty((4, xdata.h0.shape[0]))}
+    _, b, c, _ = scratch["poly"]
+
+    a = k11*k12
+    np.multiply(a, g0, out=c)
+    np.multiply(2*a, xdata.h0, out=b)
+    b += k11
+    b -= c
+    np.multiply(k11, xdata.diffhg, out=c)
+    c += 1
+    d = xdata.neg_g0
 
     # Solve cubic in [G] for each observation
-    g = np.zeros(h0.shape[0])
-    for i, p in enumerate(poly):
-        roots = np.roots(p)
-
-        # Smallest real +ve root is [G]
-        select = np.all([np.imag(roots) == 0, np.real(roots) >= 0], axis=0)
-        if select.any():
-            soln = roots[select].min()
-            soln = float(np.real(soln))
-        else:
-            # No positive real roots, set solution to 0
-            soln = 0.0
-        
-        g[i] = soln
+    # Smallest real +ve root is [G]
+    g = _cubic_smallest_positive_real(a, b, c, d, cache=cache)
 
 
     # Calculate [HG] and [HG2] complex concentrations 
-    hg  = (g*k11)/(1+(g*k11)+(g*g*k11*k12))
-    hg2 = ((g*g*k11*k12))/(1+(g*k11)+(g*g*k11*k12))
+    # Shared terms of the binding polynomial 1 + K11[G] + K11K12[G]^2
+    gk11    = g*k11
+    gk11k12 = g*g*a
+    denom   = 1/(1 + gk11 + gk11k12)
+
+    hg  = gk11*denom
+    hg2 = gk11k12*denom
     h   = 1 - hg - hg2
 
     if flavour == "add" or flavour == "stat":
@@ -542,10 +1266,15 @@ def nmr_1to2(params, xdata, flavour="none", *args, **kwargs):
         logger.debug("FLAVOUR: none or noncoop")
         hg_mat_fit = np.vstack((h, hg, hg2))
 
+    if not display:
+        # Only fit molefractions needed
+        return hg_mat_fit, None
+
     hg_mat = np.vstack((h, hg, hg2))
     return hg_mat_fit, hg_mat
 
-def nmr_2to1(params, xdata, flavour="none", *args, **kwargs):
+def nmr_2to1(params, xdata, flavour="none", cache=None, scratch=None, 
+             display=True, *args, **kwargs):
     """
     Calculates predicted [HG] and [H2G] given data object and binding constants
     as input.
@@ -565,37 +1294,36 @@ def nmr_2to1(params, xdata, flavour="none", *args, **kwargs):
         logger.debug(k11)
         logger.debug(k12)
 
-    h0  = xdata[0]
-    g0  = xdata[1]
+    h0  = xdata.h0
+    g0  = xdata.g0
 
     # Calculate free host concentration [H]: solve cubic
-    a = np.ones(h0.shape[0])*k11*k12
-    b = 2*k11*k12*g0 + k11 - h0*k11*k12
-    c = 1 + k11*g0 - k11*h0
-    d = -1. * h0
-
-    # Rows: data points, cols: poly coefficients
-    poly = np.column_stack((a, b, c, d))
+    # b and c written into reused work array where available
+    if scratch is None:
+        scratch = {"poly": np.empty((4, g0.shape[0]))}
+    _, b, c, _ = scratch["poly"]
+
+    a = k11*k12
+    np.multiply(a, h0, out=c)
+    np.multiply(2*a, g0, out=b)
+    b += k11
+    b -= c
+    np.multiply(k11, xdata.diffhg, out=c)
+    np.subtract(1, c, out=c)
+    d = xdata.neg_h0
 
     # Solve cubic in [H] for each observation
-    h = np.zeros(h0.shape[0])
-
-    for i, p in enumerate(poly):
-        roots = np.roots(p)
-        # Smallest real +ve root is [H]
-        select = np.all([np.imag(roots) == 0, np.real(roots) >= 0], axis=0)
-        if select.any():
-            soln = roots[select].min()
-            soln = float(np.real(soln))
-        else:
-            # No positive real roots, set solution to 0
-            soln = 0.0
-
-        h[i] = soln
+    # Smallest real +ve root is [H]
+    h = _cubic_smallest_positive_real(a, b, c, d, cache=cache)
 
     # Calculate [HG] and [H2G] complex concentrations 
-    hg  = (g0*h*k11)/(h0*(1+(h*k11)+(h*h*k11*k12)))
-    h2g = (2*g0*h*h*k11*k12)/(h0*(1+(h*k11)+(h*h*k11*k12)))
+    # Shared terms of the binding polynomial 1 + K11[H] + K11K12[H]^2
+    hk11    = h*k11
+    hk11k12 = h*h*a
+    denom   = (g0*xdata.h0_inv)/(1 + hk11 + hk11k12)
+
+    hg  = hk11*denom
+    h2g = 2*hk11k12*denom
     h   = 1 - hg - h2g
 
     if flavour == "add" or flavour == "stat":
@@ -606,10 +1334,15 @@ def nmr_2to1(params, xdata, flavour="none", *args, **kwargs):
         logger.debug("FLAVOUR: none or noncoop")
         hg_mat_fit = np.vstack((h, hg, h2g))
 
+    if not display:
+        # Only fit molefractions needed
+        return hg_mat_fit, None
+
     hg_mat = np.vstack((h, hg, h2g))
     return hg_mat_fit, hg_mat
 
-def uv_2to1(params, xdata, flavour="none"):
+def uv_2to1(params, xdata, flavour="none", cache=None, scratch=None, 
+            display=True, *args, **kwargs):
     """
     Calculates predicted [HG] and [H2G] given data object and binding constants
     as input.
@@ -622,37 +1355,36 @@ def uv_2to1(params, xdata, flavour="none"):
     else:
         k12 = params[1]
 
-    h0  = xdata[0]
-    g0  = xdata[1]
+    h0  = xdata.h0
+    g0  = xdata.g0
 
     # Calculate free host concentration [H]: solve cubic
-    a = np.ones(h0.shape[0])*k11*k12
-    b = 2*k11*k12*g0 + k11 - h0*k11*k12
-    c = 1 + k11*g0 - k11*h0
-    d = -1. * h0
-
-    # Rows: data points, cols: poly coefficients
-    poly = np.column_stack((a, b, c, d))
+    # b and c written into reused work array where available
+    if scratch is None:
+        scratch = {"poly": np.empty((4, g0.shape[0]))}
+    _, b, c, _ = scratch["poly"]
+
+    a = k11*k12
+    np.multiply(a, h0, out=c)
+    np.multiply(2*a, g0, out=b)
+    b += k11
+    b -= c
+    np.multiply(k11, xdata.diffhg, out=c)
+    np.subtract(1, c, out=c)
+    d = xdata.neg_h0
 
     # Solve cubic in [H] for each observation
-    h = np.zeros(h0.shape[0])
-
-    for i, p in enumerate(poly):
-        roots = np.roots(p)
-        # Smallest real +ve root is [H]
-        select = np.all([np.imag(roots) == 0, np.real(roots) >= 0], axis=0)
-        if select.any():
-            soln = roots[select].min()
-            soln = float(np.real(soln))
-        else:
-            # No positive real roots, set solution to 0
-            soln = 0.0
-
-        h[i] = soln
+    # Smallest real +ve root is [H]
+    h = _cubic_smallest_positive_real(a, b, c, d, cache=cache)
 
     # Calculate [HG] and [H2G] complex concentrations 
-    hg  = g0*((h*k11)/(1+(h*k11)+(h*h*k11*k12)))
-    h2g = g0*((2*h*h*k11*k12)/(1+(h*k11)+(h*h*k11*k12)))
+    # Shared terms of the binding polynomial 1 + K11[H] + K11K12[H]^2
+    hk11    = h*k11
+    hk11k12 = h*h*a
+    denom   = g0/(1 + hk11 + hk11k12)
+
+    hg  = hk11*denom
+    h2g = 2*hk11k12*denom
     h   = h0 - hg - h2g
 
     if flavour == "add" or flavour == "stat":
@@ -661,17 +1393,151 @@ def uv_2to1(params, xdata, flavour="none"):
     else:
         hg_mat_fit = np.vstack((h, hg, h2g))
 
-    hg_mat = np.vstack((h/h0, hg/h0, h2g/h0)) # Molefrac for display
+    if not display:
+        # Only fit molefractions needed
+        return hg_mat_fit, None
+
+    hg_mat = np.vstack((h, hg, h2g))*xdata.h0_inv # Molefrac for display
     return hg_mat_fit, hg_mat
 
-def nmr_dimer(params, xdata, *args, **kwargs):
+def _dfrac_dk_cubic(k11, k12, s0, t0, cache=None):
+    """
+    Calculates derivatives of the 1:2 or 2:1 complex fractions K11[X]/P and 
+    K11K12[X]^2/P, P = 1 + K11[X] + K11K12[X]^2, with respect to K11 and K12. 
+
+    [X] is free guest (1:2) or free host (2:1), solved from the cubic 
+        F = K11K12[X]^3 + (2K11K12 t0 + K11 - K11K12 s0)[X]^2 
+            + (1 + K11(t0 - s0))[X] - s0
+    where s0 is total [X] and t0 total of the other component, and 
+    differentiated implicitly: d[X]/dK = -(dF/dK)/(dF/d[X]).
+
+    Returns:
+        ndarray  2 x 2 x m array, rows: K11, K12, cols: fraction
+    """
+
+    a = k11*k12
+    b = 2*a*t0 + k11 - a*s0
+    c = 1 + k11*(t0 - s0)
+    x = _cubic_smallest_positive_real(a, b, c, -s0, cache=cache)
+
+    # Partial derivatives of F
+    x2     = x*x
+    dfdx   = (3*a*x + 2*b)*x + c
+    dfdk11 = (k12*(x + 2*t0 - s0) + 1)*x2 + (t0 - s0)*x
+    dfdk12 = k11*(x + 2*t0 - s0)*x2
+
+    u = k11*x
+    v = a*x2
+    p = 1 + u + v
+
+    dfrac = np.empty((2, 2) + x.shape)
+    for i, (dfdk, dudk, dvdk) in enumerate(((dfdk11, x, k12*x2), 
+                                            (dfdk12, 0, k11*x2))):
+        dx = -dfdk/dfdx
+        du = dudk + k11*dx
+        dv = dvdk + 2*a*x*dx
+        dp = du + dv
+        dfrac[i, 0] = (du*p - u*dp)/(p*p)
+        dfrac[i, 1] = (dv*p - v*dp)/(p*p)
+
+    return dfrac
+
+def _cubic_deriv_mat(dfrac, flavour, scale_hg, scale_hg2):
+    """
+    Calculates derivatives of 1:2 or 2:1 fit molefractions with respect to
+    each parameter, from _dfrac_dk_cubic fraction derivatives and the scale 
+    of each complex relative to its fraction.
+
+    Returns:
+        ndarray  p x 2 or 3 x m array
+    """
+
+    if flavour == "noncoop" or flavour == "stat":
+        # K12 = K11/4
+        dfrac = (dfrac[0] + dfrac[1]/4)[np.newaxis]
+
+    dhg  = dfrac[:, 0]*scale_hg
+    dhg2 = dfrac[:, 1]*scale_hg2
+    dh   = -dhg - dhg2
+
+    if flavour == "add" or flavour == "stat":
+        return np.stack((dh, dhg + 2*dhg2), axis=1)
+    else:
+        return np.stack((dh, dhg, dhg2), axis=1)
+
+def nmr_1to2_deriv(params, xdata, flavour="none", cache=None, 
+                   *args, **kwargs):
+    """
+    Calculates derivatives of nmr_1to2 fit molefractions with respect to each
+    parameter.
+
+    Returns:
+        ndarray  p x 2 or 3 x m array
+    """
+
+    k11 = params[0]
+    k12 = k11/4 if flavour == "noncoop" or flavour == "stat" else params[1]
+
+    dfrac = _dfrac_dk_cubic(k11, k12, xdata.g0, xdata.h0, cache=cache)
+    return _cubic_deriv_mat(dfrac, flavour, 1, 1)
+
+def uv_1to2_deriv(params, xdata, flavour="none", cache=None, 
+                  *args, **kwargs):
+    """
+    Calculates derivatives of uv_1to2 fit concentrations with respect to each
+    parameter.
+
+    Returns:
+        ndarray  p x 2 or 3 x m array
+    """
+
+    k11 = params[0]
+    k12 = k11/4 if flavour == "noncoop" or flavour == "stat" else params[1]
+
+    dfrac = _dfrac_dk_cubic(k11, k12, xdata.g0, xdata.h0, cache=cache)
+    return _cubic_deriv_mat(dfrac, flavour, xdata.h0, xdata.h0)
+
+def nmr_2to1_deriv(params, xdata, flavour="none", cache=None, 
+                   *args, **kwargs):
+    """
+    Calculates derivatives of nmr_2to1 fit molefractions with respect to each
+    parameter.
+
+    Returns:
+        ndarray  p x 2 or 3 x m array
+    """
+
+    k11 = params[0]
+    k12 = k11/4 if flavour == "noncoop" or flavour == "stat" else params[1]
+
+    dfrac = _dfrac_dk_cubic(k11, k12, xdata.h0, xdata.g0, cache=cache)
+    scale = xdata.g0*xdata.h0_inv
+    return _cubic_deriv_mat(dfrac, flavour, scale, 2*scale)
+
+def uv_2to1_deriv(params, xdata, flavour="none", cache=None, 
+                  *args, **kwargs):
+    """
+    Calculates derivatives of uv_2to1 fit concentrations with respect to each
+    parameter.
+
+    Returns:
+        ndarray  p x 2 or 3 x m array
+    """
+
+    k11 = params[0]
+    k12 = k11/4 if flavour == "noncoop" or flavour == "stat" else params[1]
+
+    dfrac = _dfrac_dk_cubic(k11, k12, xdata.h0, xdata.g0, cache=cache)
+    return _cubic_deriv_mat(dfrac, flavour, xdata.g0, 2*xdata.g0)
+
+def nmr_dimer(params, xdata, display=True, *args, **kwargs):
     """
     Calculates predicted [H] [Hs] and [He] given data object and binding
     constant as input.
     """
 
     ke = params[0]
-    h0 = xdata[0]
+    h0 = xdata.h0
 
     if ke == 0:
         # Avoid dividing by zero ...
@@ -680,9 +1546,10 @@ def nmr_dimer(params, xdata, *args, **kwargs):
 
     # Calculate free monomer concentration [H] or alpha: 
     # eq 143 from Thordarson book chapter
-    h = ((2*ke*h0 + 1) - \
-          np.lib.scimath.sqrt(((4*ke*h0 + 1)))\
-          )/(2*ke*ke*h0*h0)
+    # Real sqrt unless ke < -1/(4*h0) gives complex roots
+    disc = 4*ke*h0 + 1
+    sqrt = np.sqrt if (disc >= 0).all() else np.lib.scimath.sqrt
+    h = ((2*ke*h0 + 1) - sqrt(disc))/(2*ke*ke*h0*h0)
 
     # Calculate "in stack" concentration [Hs] or epislon: eq 149 
     # (rho = 1, n.b. one "h" missing) from Thordarson book chapter
@@ -693,17 +1560,21 @@ def nmr_dimer(params, xdata, *args, **kwargs):
     he = (2*h*h*ke*h0)/(1 - h*ke*h0)
 
     mf_fit = np.vstack((h, hs, he))
+    if not display:
+        # Only fit molefractions needed
+        return mf_fit, None
+
     mf     = np.vstack((h, hs, he))
     return mf_fit, mf
 
-def uv_dimer(params, xdata, *args, **kwargs):
+def uv_dimer(params, xdata, display=True, *args, **kwargs):
     """
     Calculates predicted [H] [Hs] and [He] given data object and binding
     constant as input.
     """
 
     ke = params[0]
-    h0 = xdata[0]
+    h0 = xdata.h0
 
     if ke == 0:
         # Avoid dividing by zero ...
@@ -712,9 +1583,10 @@ def uv_dimer(params, xdata, *args, **kwargs):
 
     # Calculate free monomer concentration [H] or alpha: 
     # eq 143 from Thordarson book chapter
-    h = ((2*ke*h0 + 1) - \
-          np.lib.scimath.sqrt(((4*ke*h0 + 1)))\
-          )/(2*ke*ke*h0*h0)
+    # Real sqrt unless ke < -1/(4*h0) gives complex roots
+    disc = 4*ke*h0 + 1
+    sqrt = np.sqrt if (disc >= 0).all() else np.lib.scimath.sqrt
+    h = ((2*ke*h0 + 1) - sqrt(disc))/(2*ke*ke*h0*h0)
 
     # Calculate "in stack" concentration [Hs] or epislon: eq 149 
     # (rho = 1, n.b. one "h" missing) from Thordarson book chapter
@@ -728,10 +1600,15 @@ def uv_dimer(params, xdata, *args, **kwargs):
     hc = h0*h
 
     mf_fit = np.vstack((hc,    hs,    he))    # Free concentration for fitting
-    mf     = np.vstack((hc/h0, hs/h0, he/h0)) # Real molefraction
+    if not display:
+        # Only fit molefractions needed
+        return mf_fit, None
+
+    mf     = np.vstack((hc,    hs,    he))*xdata.h0_inv # Real molefraction
     return mf_fit, mf
 
-def nmr_coek(params, xdata, *args, **kwargs):
+def nmr_coek(params, xdata, cache=None, scratch=None, display=True, 
+             *args, **kwargs):
     """
     Calculates predicted [H] [Hs] and [He] given data object and binding constants
     as input.
@@ -740,48 +1617,57 @@ def nmr_coek(params, xdata, *args, **kwargs):
     ke = params[0]
     rho = params[1]
 
-    h0  = xdata[0]
-
-    # Calculate free monomer concentration [H] or alpha: 
-    # eq 146 from Thordarson book chapter
-
-    a = np.ones(h0.shape[0])*(((ke*h0)**2) - (rho*((ke*h0)**2)))
-    b = 2*rho*ke*h0 - 2*ke*h0 - ((ke*h0)**2)
-    c = 2*ke*h0 + 1
-    d = -1. * np.ones(h0.shape[0])
+    h0  = xdata.h0
 
-    # Rows: data points, cols: poly coefficients
-    poly = np.column_stack((a, b, c, d))
-
-    # Solve cubic in [H] for each observation
-    h = np.zeros(h0.shape[0])
-    for i, p in enumerate(poly):
-        roots = np.roots(p)
-
-        # Smallest real +ve root is [H]
-        select = np.all([np.imag(roots) == 0, np.real(roots) >= 0], axis=0)
-        if select.any():
-            soln = roots[select].min()
-            soln = float(np.real(soln))
-        else:
-            # No positive real roots, set solution to 0
-            soln = 0.0
-        
-        h[i] = soln
-
-    # Calculate "in stack" concentration [Hs] or epislon: 
-    # eq 149 from Thordarson book chapter
-    hs = (rho*h*((h*ke*h0)**2))/((1-h*ke*h0)**2)
-
-    # Calculate "at end" concentration [He] or gamma: 
-    # eq 150 from Thordarson book chapter
-    he = (2*rho*h*h*ke*h0)/(1-h*ke*h0)
+    if ke == 0 or rho == 0:
+        # No aggregates, all free monomer
+        # (the cubic below has a spurious double root at [H]*ke*h0 = 1)
+        h  = np.ones(h0.shape[0])
+        hs = np.zeros(h0.shape[0])
+        he = np.zeros(h0.shape[0])
+    else:
+        # Calculate free monomer concentration [H] or alpha: 
+        # eq 146 from Thordarson book chapter, as a cubic in
+        # y = 1 - [H]*ke*h0, whose smallest non-negative root is the 
+        # physical one ([H]*ke*h0 < 1)
+
+        # Rows: poly coefficients, cols: data points
+        # Written into reused work array where available
+        if scratch is None:
+            scratch = {"poly": np.empty((4, h0.shape[0]))}
+        a, b, c, d = scratch["poly"]
+
+        kh = ke*h0
+        a.fill(rho - 1)
+        np.subtract(1 - rho, kh, out=b)
+        c.fill(-rho)
+        d.fill(rho)
+
+        # Solve cubic in y for each observation
+        y = _cubic_smallest_positive_real(a, b, c, d, cache=cache)
+
+        # [H], or 1 where h0 = 0
+        h = np.ones(h0.shape[0])
+        np.divide(1 - y, kh, out=h, where=kh != 0)
+
+        # Calculate "in stack" concentration [Hs] or epislon: 
+        # eq 149 from Thordarson book chapter
+        hs = (rho*h*((1 - y)**2))/(y**2)
+
+        # Calculate "at end" concentration [He] or gamma: 
+        # eq 150 from Thordarson book chapter
+        he = (2*rho*h*(1 - y))/y
 
     mf_fit = np.vstack((h, hs, he))
+    if not display:
+        # Only fit molefractions needed
+        return mf_fit, None
+
     mf     = np.vstack((h, hs, he))
     return mf_fit, mf
 
-def uv_coek(params, xdata, *args, **kwargs):
+def uv_coek(params, xdata, cache=None, scratch=None, display=True, 
+            *args, **kwargs):
     """
     Calculates predicted [H] [Hs] and [He] given data object and binding constants
     as input.
@@ -790,48 +1676,60 @@ def uv_coek(params, xdata, *args, **kwargs):
     ke = params[0]
     rho = params[1]
 
-    h0  = xdata[0]
-
-    # Calculate free monomer concentration [H] or alpha: 
-    # eq 146 from Thordarson book chapter
-
-    a = np.ones(h0.shape[0])*(((ke*h0)**2) - (rho*((ke*h0)**2)))
-    b = 2*rho*ke*h0 - 2*ke*h0 - ((ke*h0)**2)
-    c = 2*ke*h0 + 1
-    d = -1. * np.ones(h0.shape[0])
+    h0  = xdata.h0
 
-    # Rows: data points, cols: poly coefficients
-    poly = np.column_stack((a, b, c, d))
+    if ke == 0 or rho == 0:
+        # No aggregates, all free monomer
+        # (the cubic below has a spurious double root at [H]*ke*h0 = 1)
+        h  = np.ones(h0.shape[0])
+        hs = np.zeros(h0.shape[0])
+        he = np.zeros(h0.shape[0])
+    else:
+        # Calculate free monomer concentration [H] or alpha: 
+        # eq 146 from Thordarson book chapter, as a cubic in
+        # y = 1 - [H]*ke*h0, whose smallest non-negative root is the 
+        # physical one ([H]*ke*h0 < 1)
+
+        # Rows: poly coefficients, cols: data points
+        # Written into reused work array where available
+        if scratch is None:
+            scratch = {"poly": np.empty((4, h0.shape[0]))}
+        a, b, c, d = scratch["poly"]
+
+        kh = ke*h0
+        a.fill(rho - 1)
+        np.subtract(1 - rho, kh, out=b)
+        c.fill(-rho)
+        d.fill(rho)
+
+        # Solve cubic in y for each observation
+        y = _cubic_smallest_positive_real(a, b, c, d, cache=cache)
+
+        # [H], or 1 where h0 = 0
+        h = np.ones(h0.shape[0])
+        np.divide(1 - y, kh, out=h, where=kh != 0)
+
+        # Calculate "in stack" concentration [Hs] or epislon: 
+        # eq 149 from Thordarson book chapter
+        hs = (rho*h*((1 - y)**2))/(y**2)
+
+        # Calculate "at end" concentration [He] or gamma: 
+        # eq 150 from Thordarson book chapter
+        he = (2*rho*h*(1 - y))/y
 
-    # Solve cubic in [H] for each observation
-    h = np.zeros(h0.shape[0])
-    for i, p in enumerate(poly):
-        roots = np.roots(p)
-
-        # Smallest real +ve root is [H]
-        select = np.all([np.imag(roots) == 0, np.real(roots) >= 0], axis=0)
-        if select.any():
-            soln = roots[select].min()
-            soln = float(np.real(soln))
-        else:
-            # No positive real roots, set solution to 0
-            soln = 0.0
-        
-        h[i] = soln
-    
     # n.b. these fractions are multiplied by h0 
-
-    # Calculate "in stack" concentration [Hs] or epislon: eq 149 from Thordarson book chapter
-    hs = (h0*rho*h*((h*ke*h0)**2))/((1 - h*ke*h0)**2)
-
-    # Calculate "at end" concentration [He] or gamma: eq 150 from Thordarson book chapter
-    he = (h0*(2*rho*h*h*ke*h0))/(1 - h*ke*h0)
+    hs = h0*hs
+    he = h0*he
         
     # Convert to free concentration
     hc = h0*h
 
     mf_fit = np.vstack((hc,    hs,    he))    # Free concentration for fitting
-    mf     = np.vstack((hc/h0, hs/h0, he/h0)) # Real molefraction
+    if not display:
+        # Only fit molefractions needed
+        return mf_fit, None
+
+    mf     = np.vstack((hc,    hs,    he))*xdata.h0_inv # Real molefraction
     return mf_fit, mf
 
 
@@ -848,13 +1746,13 @@ def construct(key, normalise=True, flavour="none"):
 
     args_select = {
             "nmrdata":    ["FunctionBinding", (key)],
-            "nmr1to1":    ["FunctionBinding", (key, nmr_1to1,  normalise, flavour)],
-            "nmr1to2":    ["FunctionBinding", (key, nmr_1to2,  normalise, flavour)],
-            "nmr2to1":    ["FunctionBinding", (key, nmr_2to1,  normalise, flavour)],
+            "nmr1to1":    ["FunctionBinding", (key, nmr_1to1,  normalise, flavour, nmr_1to1_deriv)],
+            "nmr1to2":    ["FunctionBinding", (key, nmr_1to2,  normalise, flavour, nmr_1to2_deriv)],
+            "nmr2to1":    ["FunctionBinding", (key, nmr_2to1,  normalise, flavour, nmr_2to1_deriv)],
             "uvdata":     ["FunctionBinding", (key)],
-            "uv1to1" :    ["FunctionBinding", (key, uv_1to1,   normalise, flavour)],
-            "uv1to2" :    ["FunctionBinding", (key, uv_1to2,   normalise, flavour)],
-            "uv2to1" :    ["FunctionBinding", (key, uv_2to1,   normalise, flavour)],
+            "uv1to1" :    ["FunctionBinding", (key, uv_1to1,   normalise, flavour, uv_1to1_deriv)],
+            "uv1to2" :    ["FunctionBinding", (key, uv_1to2,   normalise, flavour, uv_1to2_deriv)],
+            "uv2to1" :    ["FunctionBinding", (key, uv_2to1,   normalise, flavour, uv_2to1_deriv)],
             "nmrdimer":   ["FunctionAgg",     (key, nmr_dimer, normalise, flavour)],
             "uvdimer":    ["FunctionAgg",     (key, uv_dimer,  normalise, flavour)],
             "nmrcoek":    ["FunctionAgg",     (key, nmr_coek,  normalise, flavour)],
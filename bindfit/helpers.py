@@ -5,9 +5,7 @@
 from __future__ import division
 from __future__ import print_function
 
-from math import sqrt
 import numpy as np
-import numpy.matlib as ml
 
 import logging
 logger = logging.getLogger('supramolecular')
@@ -74,9 +72,9 @@ def normalise(data):
     logger.debug("helpers.normalise: input data")
     logger.debug(data)
 
-    # Create matrix of initial values to subtract from original matrix
-    initialmat = ml.repmat(data.T[0,:], len(data.T), 1).T
-    data_norm = data - initialmat
+    # Subtract column of initial values from original matrix, broadcast
+    # across observations
+    data_norm = data - data[:,0:1]
     return data_norm
 
 def denormalise(data, data_norm):
@@ -90,10 +88,8 @@ def denormalise(data, data_norm):
     Returns:
         ndarray  n x m array of denormalised input data_norm
     """
-    # Create matrix of initial data values to add to fit 
-    initialmat = ml.repmat(data[:,0][np.newaxis].T, 1, data.shape[1])
-    # De-normalize normalised data (add initial values back)
-    data_denorm = data_norm + initialmat
+    # De-normalize normalised data (add column of initial values back)
+    data_denorm = data_norm + data[:,0:1]
     return data_denorm 
 
 def dilute(h0, data):
@@ -111,9 +107,9 @@ def dilute(h0, data):
 
     y = data
 
+    # Dilution factor row broadcast across each variable
     dilfac = h0/h0[0]
-    dilmat = ml.repmat(dilfac, y.shape[0], 1)
-    y_dil = (y*dilmat)
+    y_dil = (y*dilfac)
     return y_dil
 
 def pad_2d(items, const=None):
@@ -19,7 +19,7 @@ import logging
 logger = logging.getLogger('supramolecular')
 
 class Data(models.Model):
-    # Primary key: SHA1 hash of imported numpy array
+    # Primary key: BLAKE2b (20 byte digest) hash of imported numpy array
     id = models.CharField(max_length=40, primary_key=True)
 
     # 2D array of input x value fields (eg: [H]0 and [G]0 for NMR 1:1)
@@ -82,9 +82,12 @@ class Data(models.Model):
 
     @classmethod
     def from_np(cls, header, array, fitter=None):
-        # Use SHA1 hash of array as primary key to avoid duplication
+        # Use hash of array as primary key to avoid duplication
+        # BLAKE2b is faster than SHA1 for large arrays, 20 byte digest keeps 
+        # the same 40 character key
         # TODO change this to hash both header and array??
-        id = hashlib.sha1(np.ascontiguousarray(array.data)).hexdigest()
+        id = hashlib.blake2b(np.ascontiguousarray(array), 
+                             digest_size=20).hexdigest()
 
         # Data format definitions - number of columns expected in x
         # Defined as "many-to-one" dict with tuples and converted 
@@ -121,8 +124,10 @@ class Data(models.Model):
         return cls(id=id, x=x, y=y, labels_x=x_labels, labels_y=y_labels)
 
     def to_dict(self, fitter, dilute=False):
-        x = np.array(self.x)
-        y = np.array(self.y)[0]
+        # Single C-ordered float64 block per input: rows of x (h0, g0) and y
+        # are contiguous views for the fitter's elementwise calculations
+        x = np.ascontiguousarray(self.x,    dtype=np.float64)
+        y = np.ascontiguousarray(self.y[0], dtype=np.float64)
 
         # Calculate x values for plotting
         x_plot = functions.construct(fitter).format_x(x)
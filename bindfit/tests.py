@@ -0,0 +1,334 @@
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from . import fitter
+from . import functions
+
+
+
+def _roots_reference(a, b, c, d):
+    """
+    Smallest real non-negative root of each cubic with np.roots, 0 if none.
+    """
+
+    soln = np.zeros(len(a))
+    for i, p in enumerate(zip(a, b, c, d)):
+        roots = np.roots(p)
+
+        # Allow for rounding in imaginary parts of (near) repeated roots
+        real = np.abs(roots.imag) <= 1e-8*np.abs(roots)
+        roots = roots.real[real]
+        roots = roots[roots >= 0]
+        if roots.size:
+            soln[i] = roots.min()
+    return soln
+
+def _cubic_1to2(k11, k12, h0, g0):
+    """
+    Cubic coefficients in [G] as built by the 1:2 functions.
+    """
+
+    a = np.full(h0.shape, k11*k12)
+    b = 2*k11*k12*h0 + k11 - k11*k12*g0
+    c = 1 + k11*(h0 - g0)
+    d = -g0
+    return a, b, c, d
+
+
+
+class CubicSolverTest(unittest.TestCase):
+    def setUp(self):
+        # Typical titration: fixed [H]0, [G]0 from 0 to 20 equivalents
+        self.h0 = np.full(21, 1e-3)
+        self.g0 = np.linspace(0, 20e-3, 21)
+
+        self.ks = [ (k11, k12)
+                    for k11 in 10.**np.arange(-2, 9)
+                    for k12 in 10.**np.arange(-2, 9) ]
+
+    def assertRootsClose(self, soln, ref):
+        np.testing.assert_allclose(soln, ref, rtol=1e-8, atol=1e-14)
+
+    def test_1to2_cubics_match_np_roots(self):
+        for k11, k12 in self.ks:
+            a, b, c, d = _cubic_1to2(k11, k12, self.h0, self.g0)
+            soln = functions._cubic_smallest_positive_real(a, b, c, d)
+            self.assertRootsClose(soln, _roots_reference(a, b, c, d))
+
+            # g0 = 0 rows have [G] = 0
+            self.assertEqual(soln[0], 0)
+
+    def test_np_solver_matches_np_roots(self):
+        for k11, k12 in self.ks:
+            a, b, c, d = _cubic_1to2(k11, k12, self.h0, self.g0)
+            soln = functions._cubic_smallest_positive_real_np(a, b, c, d)
+            self.assertRootsClose(soln, _roots_reference(a, b, c, d))
+
+    def test_quadratic_rows(self):
+        # a == 0: quadratic (or linear, a == b == 0) in x
+        a = np.zeros(4)
+        b = np.array([1., -2.,  0.,  1.])
+        c = np.array([3.,  1.,  2., -3.])
+        d = np.array([-4., 1., -1.,  2.])
+
+        soln = functions._cubic_smallest_positive_real(a, b, c, d)
+        np.testing.assert_allclose(soln, [1., 1., 0.5, 1.])
+
+    def test_mixed_and_random_cubics(self):
+        rng = np.random.RandomState(0)
+        a, b, c, d = ( rng.standard_normal(500)*10**rng.uniform(-4, 4, 500)
+                       for _ in range(4) )
+        a[:20] = 0
+
+        soln = functions._cubic_smallest_positive_real_np(a, b, c, d)
+        self.assertRootsClose(soln, _roots_reference(a, b, c, d))
+
+    def test_warm_start(self):
+        # Warm start is used when there is no compiled kernel
+        with mock.patch.object(functions, "numba", None):
+            cache = {}
+            for k11, k12 in [(1e3, 1e2), (1.01e3, 1e2), (1e5, 1e-2)]:
+                a, b, c, d = _cubic_1to2(k11, k12, self.h0, self.g0)
+                soln = functions._cubic_smallest_positive_real(a, b, c, d,
+                                                               cache=cache)
+                self.assertRootsClose(soln, _roots_reference(a, b, c, d))
+                self.assertIs(cache["root"], soln)
+
+    @unittest.skipIf(functions.numba is None, "numba not installed")
+    def test_numba_kernel_matches_np(self):
+        rng = np.random.RandomState(1)
+        a, b, c, d = ( rng.standard_normal(500)*10**rng.uniform(-6, 6, 500)
+                       for _ in range(4) )
+        a[:20] = 0
+
+        soln = np.empty(500)
+        functions._cubic_kernel(a, b, c, d, soln)
+        ref  = functions._cubic_smallest_positive_real_np(a, b, c, d)
+
+        # Kernel returns NaN where the closed form overflows
+        inds = ~np.isnan(soln)
+        np.testing.assert_allclose(soln[inds], ref[inds],
+                                   rtol=1e-12, atol=1e-300)
+
+
+
+
+class ObjectiveBatchTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.x = np.vstack((np.full(25, 1e-3), np.linspace(0, 10e-3, 25)))
+        self.y = rng.random_sample((3, 25))
+        self.ks = np.array([10., 1e3, 1e5])
+
+    def test_batch_matches_single(self):
+        for key in ("nmr1to1", "uv1to1"):
+            for normalise in (True, False):
+                f = functions.construct(key, normalise=normalise)
+                y = self.y - self.y[:,:1] if normalise else self.y
+
+                ssr = f.objective_batch([self.ks], self.x, y)
+                ref = [ f.objective([k], self.x, y) for k in self.ks ]
+                np.testing.assert_allclose(ssr, ref, rtol=1e-12)
+
+    def test_batch_unsupported_fitter(self):
+        f = functions.construct("nmr1to2")
+        with self.assertRaises(ValueError):
+            f.objective_batch([self.ks, self.ks], self.x, self.y)
+
+    @unittest.skipIf(functions.cupy is None, "cupy not installed")
+    def test_batch_gpu_matches_host(self):
+        for key in ("nmr1to1", "uv1to1"):
+            for normalise in (True, False):
+                f = functions.construct(key, normalise=normalise)
+                y = self.y - self.y[:,:1] if normalise else self.y
+
+                ssr = f.objective_batched_gpu([self.ks], self.x, y)
+                ref = f.objective_batch([self.ks], self.x, y)
+                self.assertIsInstance(ssr, np.ndarray)
+                np.testing.assert_allclose(ssr, ref, rtol=1e-10)
+
+
+
+class JacobianTest(unittest.TestCase):
+    def setUp(self):
+        self.x = np.vstack((np.full(25, 1e-3), np.linspace(0, 10e-3, 25)))
+
+        rng = np.random.RandomState(0)
+        self.y = rng.random_sample((3, 25))
+
+    def assertJacobianClose(self, f, params, y):
+        jac = f.jacobian(params, self.x, y)
+
+        # Central differences
+        ref = []
+        for i, p in enumerate(params):
+            h = np.zeros(len(params))
+            h[i] = p*1e-4
+            ref.append((f.residuals(params + h, self.x, y) 
+                        - f.residuals(params - h, self.x, y))/(2*h[i]))
+        ref = np.array(ref).T
+
+        self.assertEqual(jac.shape, (y.size, len(params)))
+        np.testing.assert_allclose(jac, ref, 
+                                   rtol=0, atol=1e-6*np.abs(ref).max())
+
+    def test_1to1_jacobian(self):
+        for key in ("nmr1to1", "uv1to1"):
+            for normalise in (True, False):
+                f = functions.construct(key, normalise=normalise)
+                y = self.y - self.y[:,:1] if normalise else self.y
+
+                for k in (10., 750., 1e5):
+                    self.assertJacobianClose(f, np.array([k]), y)
+
+    def test_cubic_jacobian(self):
+        for key in ("nmr1to2", "uv1to2", "nmr2to1", "uv2to1"):
+            for flavour in ("none", "add", "noncoop", "stat"):
+                for normalise in (True, False):
+                    f = functions.construct(key, normalise=normalise, 
+                                            flavour=flavour)
+                    y = self.y - self.y[:,:1] if normalise else self.y
+
+                    for ks in ((1e3, 1e2), (10., 5e4), (1e5, 1e3)):
+                        if flavour == "noncoop" or flavour == "stat":
+                            # K12 = K11/4
+                            ks = ks[:1]
+                        self.assertJacobianClose(f, np.array(ks), y)
+
+    def test_1to1_jacobian_clipped_uv(self):
+        # Decreasing y gives negative coefficients, clipped to 0 for UV
+        f = functions.construct("uv1to1", normalise=False)
+        y = np.vstack((np.linspace(1, -1, 25), np.linspace(0.2, 0.5, 25)))
+
+        mf, _ = f.f([750.], f.prepare(self.x))
+        self.assertTrue((functions._normal_eq_solve(mf.T, y.T) < 0).any())
+        self.assertJacobianClose(f, np.array([750.]), y)
+
+    def _simulate_nmr(self, key, params, dy):
+        f = functions.construct(key)
+        mf, _ = f.f(params, f.prepare(self.x))
+        return np.vstack(( 7 + mf.T.dot(dy[0]), 
+                           8 + mf.T.dot(dy[1]) ))
+
+    def _fit_trf(self, key, init, y):
+        params = { name: {"init": value, "bounds": {"min": 0, "max": None}}
+                   for name, value in init.items() }
+
+        fit = fitter.Fitter(self.x, y, functions.construct(key))
+        fit.run_scipy(params, method="trf")
+        return fit
+
+    def test_trf_fit_1to1(self):
+        y   = self._simulate_nmr("nmr1to1", [1200.], [[0, 1.0], [0, -0.5]])
+        fit = self._fit_trf("nmr1to1", {"k": 100}, y)
+
+        self.assertAlmostEqual(fit.params["k"]["value"]/1200., 1, places=6)
+        np.testing.assert_allclose(fit.fit, y, rtol=1e-9)
+
+    def test_trf_fit_1to2(self):
+        y   = self._simulate_nmr("nmr1to2", [2000., 300.], 
+                                 [[0, 1.0, 1.5], [0, -0.5, 0.7]])
+        fit = self._fit_trf("nmr1to2", {"k1": 1000, "k2": 100}, y)
+
+        self.assertAlmostEqual(fit.params["k1"]["value"]/2000., 1, places=4)
+        self.assertAlmostEqual(fit.params["k2"]["value"]/300., 1, places=4)
+        np.testing.assert_allclose(fit.fit, y, rtol=1e-9)
+
+
+
+class CoekTest(unittest.TestCase):
+    def setUp(self):
+        self.x = np.vstack((np.linspace(1e-3, 5e-2, 20),))
+
+        rng = np.random.RandomState(0)
+        self.y = rng.random_sample((2, 20))
+
+    def _roots_reference(self, ke, rho):
+        """
+        [H], [Hs], [He] from the baseline cubic in [H] with np.roots, 
+        taking the smallest non-negative root with [H]*ke*h0 < 1.
+        """
+
+        mf = []
+        for kh in ke*self.x[0]:
+            roots = np.roots([ kh*kh*(1 - rho), kh*(2*rho - 2 - kh), 
+                               2*kh + 1, -1 ])
+            roots = roots.real[np.abs(roots.imag) <= 1e-8*np.abs(roots)]
+            h  = roots[(roots >= 0) & (roots*kh < 1)].min()
+            hs = (rho*h*((h*kh)**2))/((1 - h*kh)**2)
+            he = (2*rho*h*h*kh)/(1 - h*kh)
+            mf.append([h, hs, he])
+        return np.array(mf).T
+
+    def test_coek_matches_np_roots(self):
+        h0 = self.x[0]
+        for key, scale in (("nmrcoek", 1), ("uvcoek", h0)):
+            f = functions.construct(key)
+            for ke in (10., 2700., 1e5):
+                for rho in (0.01, 0.3, 1., 2.):
+                    mf, _ = f.f([ke, rho], f.prepare(self.x))
+                    np.testing.assert_allclose(
+                            mf, self._roots_reference(ke, rho)*scale, 
+                            rtol=1e-7)
+
+    def test_coek_rho_zero(self):
+        # No aggregates: all free monomer
+        for key in ("nmrcoek", "uvcoek"):
+            f = functions.construct(key)
+            _, mf = f.f([2700., 0.], f.prepare(self.x))
+            np.testing.assert_allclose(mf, [[1]*20, [0]*20, [0]*20], rtol=1e-15)
+
+            ssr = f.objective([2700., 0.], self.x, self.y, True)
+            self.assertTrue(np.isfinite(ssr))
+
+    def test_coek_fit_from_rho_zero(self):
+        f = functions.construct("uvcoek", normalise=False)
+        mf, _ = f.f([2700., 0.3], f.prepare(self.x))
+        hmat = np.array([mf[0] + mf[2]/2, mf[1] + mf[2]/2])
+        y = np.vstack(( hmat.T.dot([100., 1000.]), hmat.T.dot([500., -50.]) ))
+
+        params = { "ke":  {"init": 1000, "bounds": {"min": 0, "max": None}},
+                   "rho": {"init": 0,    "bounds": {"min": 0, "max": None}} }
+        fit = fitter.Fitter(self.x, y, f, normalise=False)
+        fit.run_scipy(params, method="Nelder-Mead")
+
+        self.assertAlmostEqual(fit.params["ke"]["value"][0]/2700., 1, 
+                               places=6)
+        self.assertAlmostEqual(fit.params["rho"]["value"]/0.3, 1, places=6)
+
+
+
+class MonteCarloTest(unittest.TestCase):
+    def setUp(self):
+        x = np.vstack((np.full(15, 1e-3), np.linspace(0, 10e-3, 15)))
+
+        f = functions.construct("nmr1to1")
+        mf, _ = f.f([800.], f.prepare(x))
+        y = np.vstack(( 7 + mf.T.dot([0, 1.0]), 8 + mf.T.dot([0, -0.5]) ))
+
+        self.fit = fitter.Fitter(x, y, f)
+        self.fit.run_scipy({"k": {"init": 100, 
+                                  "bounds": {"min": 0, "max": None}}})
+
+    def _run(self, processes):
+        np.random.seed(0)
+        with mock.patch.object(fitter, "cpu_count", return_value=processes):
+            params = self.fit.calc_monte_carlo(4, [0.02, 0.01], 0.005)
+        return params["k"]["value"], params["k"]["mc"]
+
+    def test_serial_matches_pool(self):
+        value = self.fit.params["k"]["value"]
+
+        serial_value, serial_mc = self._run(1)
+        pool_value,   pool_mc   = self._run(2)
+
+        # Refits leave the optimised params alone in either case
+        self.assertEqual(serial_value, value)
+        self.assertEqual(pool_value,   value)
+        np.testing.assert_allclose(serial_mc, pool_mc, rtol=1e-12)
+